@@ -4,16 +4,73 @@ RGB Grid Screensaver - Python Pygame Version
 Displays a grid that fills with random RGB colors, with MIDI note sounds for each color.
 """
 
+from __future__ import annotations
+
 import pygame
 import random
 import math
+import functools
+import queue
+import threading
 import numpy as np
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, Dict
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional; tones are then generated with plain NumPy
+    njit = None
+
+
+def _generate_tone_core(frequency: float, frames: int, sample_rate: int, fade: int,
+                        amplitude: float) -> np.ndarray:
+    """Sine wave with a linear fade in/out, as mono int16 samples"""
+    # float32 throughout: plenty for 16-bit output, and half the memory traffic of float64
+    # Generate sine wave (np.sin has a SIMD float32 loop, faster than a polynomial in NumPy)
+    t = np.arange(frames, dtype=np.float32)
+    wave = np.sin(t * np.float32(2 * np.pi * frequency / sample_rate))
+    
+    # Apply envelope (fade in/out)
+    envelope = np.ones(frames, dtype=np.float32)
+    if fade:
+        envelope[:fade] = np.linspace(0, 1, fade, endpoint=False, dtype=np.float32)
+        envelope[-fade:] = np.linspace(1, 0, fade, endpoint=False, dtype=np.float32)
+    
+    wave *= envelope
+    wave *= np.float32(amplitude)
+    return wave.astype(np.int16)
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _generate_tone_core(frequency, frames, sample_rate, fade, amplitude):
+        """Sine wave with a linear fade in/out, as mono int16 samples (JIT-compiled)"""
+        arr = np.empty(frames, dtype=np.int16)
+        # float32 throughout, matching the NumPy version
+        step = np.float32(2 * math.pi * frequency / sample_rate)
+        amp = np.float32(amplitude)
+        inv_fade = np.float32(1.0 / fade) if fade else np.float32(0.0)
+        for i in range(frames):
+            envelope = np.float32(1.0)
+            if i < fade:  # Fade in
+                envelope = np.float32(i) * inv_fade
+            elif i >= frames - fade:  # Fade out
+                envelope = np.float32(frames - i) * inv_fade
+            arr[i] = np.int16(math.sin(step * np.float32(i)) * envelope * amp)
+        return arr
 
 class RGBGridScreensaver:
     def __init__(self):
+        # pre_init so pygame.init() opens the mixer in mono (mixer.init afterwards is a no-op).
+        # allowedchanges=0 makes SDL convert to the device format instead of adopting its
+        # channel count or frequency (tones are generated as mono at 44.1 kHz).
+        pygame.mixer.pre_init(frequency=44100, size=-16, channels=1, buffer=2048, allowedchanges=0)
         pygame.init()
-        pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=512)
+        
+        # Tones are generated as 1-D int16 arrays, so the mixer must be 16-bit mono
+        mixer_settings = pygame.mixer.get_init()
+        if mixer_settings is None or mixer_settings[1:] != (-16, 1):
+            raise RuntimeError(f"Expected a 16-bit mono mixer, got {mixer_settings}")
         
         # Get screen dimensions
         self.screen_info = pygame.display.Info()
@@ -28,25 +85,39 @@ class RGBGridScreensaver:
         # Grid setup
         self.grid_cols = 0
         self.grid_rows = 0
-        self.grid_data: List[Optional[Tuple[int, int, int]]] = []
-        self.grid_index = 0
+        # Cell colors as a (rows, cols, 3) uint8 array, stored in ring buffer order
+        self.grid_rgb = np.zeros((0, 0, 3), dtype=np.uint8)
+        # Ring buffer write position; once filled, the oldest cell is at the cursor
+        self._write_cursor = 0
+        self._filled = False
+        # Redraw only when the grid changed; a single changed cell is updated in place
+        self.needs_redraw = True
+        self._changed_cell: Optional[int] = None
         # 120 BPM = 120 beats per minute = 2 beats per second = 500ms per beat
         self.update_interval = 500  # milliseconds
         
-        # Track previous colors for each cell
-        self.previous_cell_colors: List[Optional[str]] = []
-        
         # Color to MIDI note mapping for static colors
-        self.color_to_midi_map: Dict[str, int] = {
-            '#000000': 36,  # C2 - Black
-            '#0a0a0a': 38,  # D2 - Very dark gray
-            '#1a1a1a': 40,  # E2 - Dark gray
-            '#ffffff': 60   # C4 - White
+        self.color_to_midi_map: Dict[Tuple[int, int, int], int] = {
+            (0, 0, 0): 36,        # C2 - Black (#000000)
+            (10, 10, 10): 38,     # D2 - Very dark gray (#0a0a0a)
+            (26, 26, 26): 40,     # E2 - Dark gray (#1a1a1a)
+            (255, 255, 255): 60   # C4 - White (#ffffff)
         }
         
         # Audio setup
         self.current_sound: Optional[pygame.mixer.Sound] = None
         
+        # Tone cache keyed by (note, duration); notes are clamped to 36-96.
+        # Pre-generating it also warms up the JIT when Numba is available.
+        self._tone_cache: Dict[Tuple[int, float], pygame.mixer.Sound] = {}
+        for note in range(36, 97):
+            self._get_tone(note, 0.2)
+        
+        # Notes are played on a background thread so the draw loop never waits on audio
+        self._note_queue: queue.Queue[Optional[Tuple[int, float]]] = queue.Queue()
+        self._audio_thread = threading.Thread(target=self._audio_worker, daemon=True)
+        self._audio_thread.start()
+        
         # Font setup
         self.fonts = {}
         self._init_fonts()
@@ -54,9 +125,11 @@ class RGBGridScreensaver:
         # Initialize grid
         self.update_grid_size()
         
-        # Clock for timing
-        self.clock = pygame.time.Clock()
+        # Timing: the loop sleeps until the next update, with a periodic full repaint
+        # to recover from dropped flips
         self.last_update = 0
+        self.repaint_interval = 1000  # milliseconds
+        self._last_repaint = 0
         
     def _init_fonts(self):
         """Initialize fonts for different cell sizes"""
@@ -68,19 +141,25 @@ class RGBGridScreensaver:
             # Fallback to default font
             self.fonts['large'] = pygame.font.Font(None, 12)
             self.fonts['medium'] = pygame.font.Font(None, 10)
+        
+        # Rendered labels, cached per color and size tier. Sized to hold a label for every
+        # cell of large grids (e.g. ~1600 at 4K, ~3200 on 32:9 screens); a full redraw
+        # visits every cell, so a smaller LRU would miss every time.
+        self._label_cache = functools.lru_cache(maxsize=4096)(self._render_label)
     
     def midi_note_to_frequency(self, note: int) -> float:
         """Convert MIDI note number to frequency in Hz"""
         # A4 (MIDI note 69) = 440 Hz
         return 440 * (2 ** ((note - 69) / 12))
     
-    def color_to_midi_note(self, hex_color: str = None, rgb: Optional[Tuple[int, int, int]] = None) -> int:
+    def color_to_midi_note(self, rgb: Optional[Tuple[int, int, int]] = None) -> int:
         """Convert color to MIDI note number"""
         # Check if it's a mapped static color
-        if hex_color and hex_color.lower() in self.color_to_midi_map:
-            return self.color_to_midi_map[hex_color.lower()]
+        if rgb in self.color_to_midi_map:
+            return self.color_to_midi_map[rgb]
         
-        # For dynamic RGB colors, map based on RGB values
+        # For dynamic RGB colors, map based on RGB values.
+        # Scalar math: use Python ints/floats and math.*, not numpy.* (~10x call overhead)
         if rgb:
             r, g, b = rgb
             # Red maps to lower notes, Green to middle, Blue to higher
@@ -99,43 +178,50 @@ class RGBGridScreensaver:
     def generate_tone(self, frequency: float, duration: float = 0.2, sample_rate: int = 44100) -> pygame.mixer.Sound:
         """Generate a sine wave tone as a pygame Sound object"""
         frames = int(duration * sample_rate)
-        arr = np.zeros((frames, 2), dtype=np.int16)
-        
         max_sample = 2**(16 - 1) - 1
         
-        for i in range(frames):
-            # Generate sine wave
-            wave = math.sin(2 * math.pi * frequency * i / sample_rate)
-            
-            # Apply envelope (fade in/out)
-            envelope = 1.0
-            if i < sample_rate * 0.01:  # Fade in
-                envelope = i / (sample_rate * 0.01)
-            elif i > frames - sample_rate * 0.01:  # Fade out
-                envelope = (frames - i) / (sample_rate * 0.01)
-            
-            sample = int(wave * max_sample * envelope * 0.3)  # 0.3 for volume
-            arr[i][0] = sample  # Left channel
-            arr[i][1] = sample  # Right channel
+        # 10ms fade in/out
+        fade = min(int(sample_rate * 0.01), frames // 2)
+        
+        # Mono int16 samples to match the mixer (channels=1); 0.3 for volume
+        arr = _generate_tone_core(frequency, frames, sample_rate, fade, max_sample * 0.3)
         
         return pygame.sndarray.make_sound(arr)
     
+    def _get_tone(self, note: int, duration: float) -> pygame.mixer.Sound:
+        """Return the cached tone for a MIDI note, generating it on first use"""
+        key = (note, duration)
+        sound = self._tone_cache.get(key)
+        if sound is None:
+            sound = self.generate_tone(self.midi_note_to_frequency(note), duration)
+            self._tone_cache[key] = sound
+        return sound
+    
     def play_midi_note(self, note: int, velocity: int = 64, duration: float = 0.2):
+        """Queue a MIDI note to be played on the audio thread"""
+        # Adjust duration based on velocity (optional)
+        # duration = duration * (velocity / 127)
+        
+        self._note_queue.put((note, duration))
+    
+    def _audio_worker(self):
+        """Play queued notes until a None sentinel is received"""
+        while True:
+            item = self._note_queue.get()
+            if item is None:
+                break
+            self._play_tone(*item)
+    
+    def _play_tone(self, note: int, duration: float):
         """Play a MIDI note using generated tone"""
         # Stop any currently playing sound
         if self.current_sound:
             self.current_sound.stop()
             self.current_sound = None
         
-        # Convert MIDI note to frequency
-        frequency = self.midi_note_to_frequency(note)
-        
-        # Adjust duration based on velocity (optional)
-        # duration = duration * (velocity / 127)
-        
-        # Generate and play tone
+        # Look up (or generate) and play tone
         try:
-            sound = self.generate_tone(frequency, duration)
+            sound = self._get_tone(note, duration)
             sound.play()
             self.current_sound = sound
         except Exception as e:
@@ -167,23 +253,66 @@ class RGBGridScreensaver:
         self.cell_size = min(cell_width, cell_height)
         
         # Resize grid data array if dimensions changed
-        total_cells = self.grid_cols * self.grid_rows
-        if len(self.grid_data) != total_cells:
-            old_data = self.grid_data.copy()
-            self.grid_data = [None] * total_cells
-            
-            # Copy old data if possible
-            if old_data:
-                min_cells = min(len(old_data), total_cells)
-                for i in range(min_cells):
-                    self.grid_data[i] = old_data[i]
-            
-            # Reset index if grid got smaller
-            if self.grid_index >= total_cells:
-                self.grid_index = total_cells
-            
-            # Initialize previous colors array
-            self.previous_cell_colors = [None] * total_cells
+        if self.grid_rgb.shape[:2] != (self.grid_rows, self.grid_cols):
+            # Empty cells show the default background (#0a0a0a)
+            self.grid_rgb = np.full((self.grid_rows, self.grid_cols, 3), 10, dtype=np.uint8)
+            # Flat (cells, 3) view of the same memory, indexed by ring buffer position
+            self._grid_cells = self.grid_rgb.reshape(-1, 3)
+            self._write_cursor = 0
+            self._filled = False
+        
+        # Cell positions and rectangles in display order
+        pitch = self.cell_size + gap
+        self._cell_positions = [
+            (col * pitch, row * pitch)
+            for row in range(self.grid_rows)
+            for col in range(self.grid_cols)
+        ]
+        self._cell_rects = [
+            pygame.Rect(x, y, self.cell_size, self.cell_size) for x, y in self._cell_positions
+        ]
+        
+        # Labels may be wider than their cell. Cells are painted in order, so a label
+        # stays visible to the left of its cell but is covered by the cells after it.
+        self._label_clips = []
+        for row_start in range(0, len(self._cell_rects), self.grid_cols):
+            row_rects = self._cell_rects[row_start:row_start + self.grid_cols]
+            rights = [cell_rect.left for cell_rect in row_rects[1:]] + [width]
+            for cell_rect, right in zip(row_rects, rights):
+                self._label_clips.append(pygame.Rect(0, cell_rect.top, right, cell_rect.height))
+        
+        # Text label size tier for this cell size (None if cells are too small)
+        if self.cell_size > 40:
+            self._label_tier: Optional[str] = 'large'
+        elif self.cell_size > 25:
+            self._label_tier = 'medium'
+        else:
+            self._label_tier = None
+        
+        self._mark_dirty()
+        
+        # Pixel -> cell index maps used to upscale the grid array to the screen.
+        # Gap pixels map to an extra always-black cell past the last row/column.
+        self._pixel_cols = np.full(width, self.grid_cols, dtype=np.intp)
+        self._pixel_rows = np.full(height, self.grid_rows, dtype=np.intp)
+        for col in range(self.grid_cols):
+            cell_rect = self._cell_rects[col]
+            self._pixel_cols[cell_rect.left:cell_rect.right] = col
+        for row in range(self.grid_rows):
+            cell_rect = self._cell_rects[row * self.grid_cols]
+            self._pixel_rows[cell_rect.top:cell_rect.bottom] = row
+        # Cell colors mapped to the screen's pixel format, padded with the black sentinel
+        self._padded_grid = np.full((self.grid_rows + 1, self.grid_cols + 1),
+                                    self.screen.map_rgb((0, 0, 0)), dtype=np.uint32)
+        
+        # Pre-rendered empty grid (default background and border) for unfilled cells
+        default_bg = (10, 10, 10)
+        default_border = (26, 26, 26)
+        self._empty_bg_surface = pygame.Surface((width, height))
+        self._empty_bg_surface.fill((0, 0, 0))
+        for cell_rect in self._cell_rects:
+            pygame.draw.rect(self._empty_bg_surface, default_bg, cell_rect)
+            pygame.draw.rect(self._empty_bg_surface, default_border, cell_rect, 1)
     
     def generate_random_rgb(self) -> Tuple[int, int, int]:
         """Generate random RGB values (0-255 for each channel)"""
@@ -203,22 +332,29 @@ class RGBGridScreensaver:
         rgb_value = self.generate_random_rgb()
         
         # Play MIDI note for the newly added color
-        hex_color = self.rgb_to_hex(*rgb_value)
-        midi_note = self.color_to_midi_note(hex_color, rgb_value)
+        midi_note = self.color_to_midi_note(rgb_value)
         velocity = int((rgb_value[0] + rgb_value[1] + rgb_value[2]) / 3 / 255 * 127)
         self.play_midi_note(midi_note, max(1, velocity), 0.2)
         
         total_cells = self.grid_cols * self.grid_rows
         
-        # Update grid data
-        if self.grid_index >= total_cells:
-            # Grid is full, shift all values left
-            for i in range(total_cells - 1):
-                self.grid_data[i] = self.grid_data[i + 1]
-            self.grid_data[total_cells - 1] = rgb_value
-        else:
-            self.grid_data[self.grid_index] = rgb_value
-            self.grid_index += 1
+        # Update grid data (once full, this overwrites the oldest cell)
+        self._grid_cells[self._write_cursor] = rgb_value
+        
+        # Until the grid is full only the new cell changes; afterwards every cell scrolls
+        self._mark_dirty(None if self._filled else self._write_cursor)
+        
+        self._write_cursor = (self._write_cursor + 1) % total_cells
+        if self._write_cursor == 0:
+            self._filled = True
+    
+    def _mark_dirty(self, cell: Optional[int] = None):
+        """Request a redraw of one cell, or of the whole grid if cell is None"""
+        if self.needs_redraw and self._changed_cell != cell:
+            # Several pending changes: fall back to a full redraw
+            cell = None
+        self.needs_redraw = True
+        self._changed_cell = cell
     
     def get_text_color(self, rgb: Tuple[int, int, int]) -> Tuple[int, int, int]:
         """Calculate text color (white or black based on brightness)"""
@@ -226,80 +362,92 @@ class RGBGridScreensaver:
         brightness = (r * 299 + g * 587 + b * 114) / 1000
         return (0, 0, 0) if brightness > 128 else (255, 255, 255)
     
+    def _render_label(self, rgb: Tuple[int, int, int], tier: str) -> pygame.Surface:
+        """Render the text label for a cell color (use the cached self._label_cache)"""
+        if tier == 'large':
+            # Show RGB values
+            text = f"{rgb[0]},{rgb[1]},{rgb[2]}"
+        else:
+            # Show hex code
+            text = self.rgb_to_hex(*rgb).upper()
+        return self.fonts[tier].render(text, True, self.get_text_color(rgb))
+    
+    def _draw_label(self, i: int, rgb: Tuple[int, int, int]) -> Optional[pygame.Rect]:
+        """Draw the text label centered in display cell i, returning the area drawn"""
+        if not self._label_tier:
+            return None
+        text_surface = self._label_cache(rgb, self._label_tier)
+        # Center on the unrounded cell position, as the original per-cell drawing did
+        x, y = self._cell_positions[i]
+        center = (x + self.cell_size // 2, y + self.cell_size // 2)
+        self.screen.set_clip(self._label_clips[i])
+        drawn = self.screen.blit(text_surface, text_surface.get_rect(center=center))
+        self.screen.set_clip(None)
+        return drawn
+    
+    def draw_cell(self, i: int):
+        """Redraw a single cell (display index i) and update only its screen area"""
+        rgb = tuple(self._grid_cells[i].tolist())
+        cell_rect = self._cell_rects[i]
+        pygame.draw.rect(self.screen, rgb, cell_rect)
+        label_rect = self._draw_label(i, rgb)
+        pygame.display.update(cell_rect.union(label_rect) if label_rect else cell_rect)
+    
     def draw_grid(self):
         """Draw the grid on the screen"""
-        self.screen.fill((0, 0, 0))  # Black background
-        
-        gap = 2
+        self._last_repaint = pygame.time.get_ticks()
         total_cells = self.grid_cols * self.grid_rows
         
-        # Initialize previous colors array if needed
-        if len(self.previous_cell_colors) != total_cells:
-            self.previous_cell_colors = [None] * total_cells
-        
-        for i in range(total_cells):
-            row = i // self.grid_cols
-            col = i % self.grid_cols
-            
-            # Calculate cell position
-            x = col * (self.cell_size + gap)
-            y = row * (self.cell_size + gap)
-            
-            current_color = None
-            
-            if self.grid_data[i] is not None:
-                rgb = self.grid_data[i]
-                current_color = self.rgb_to_hex(*rgb)
-                
-                # Draw cell with RGB color
-                cell_rect = pygame.Rect(x, y, self.cell_size, self.cell_size)
-                pygame.draw.rect(self.screen, rgb, cell_rect)
-                pygame.draw.rect(self.screen, rgb, cell_rect, 1)  # Border
-                
-                # Draw text if cell is large enough
-                if self.cell_size > 15:
-                    text_color = self.get_text_color(rgb)
-                    
-                    if self.cell_size > 40:
-                        # Show RGB values
-                        text = f"{rgb[0]},{rgb[1]},{rgb[2]}"
-                        font = self.fonts['large']
-                    elif self.cell_size > 25:
-                        # Show hex code
-                        text = current_color.upper()
-                        font = self.fonts['medium']
-                    else:
-                        text = ""
-                    
-                    if text:
-                        text_surface = font.render(text, True, text_color)
-                        text_rect = text_surface.get_rect(center=(x + self.cell_size // 2, 
-                                                                   y + self.cell_size // 2))
-                        self.screen.blit(text_surface, text_rect)
-            else:
-                # Default background color
-                default_bg = (10, 10, 10)
-                default_border = (26, 26, 26)
-                current_color = '#0a0a0a'
-                
-                cell_rect = pygame.Rect(x, y, self.cell_size, self.cell_size)
-                pygame.draw.rect(self.screen, default_bg, cell_rect)
-                pygame.draw.rect(self.screen, default_border, cell_rect, 1)
-            
-            # Update previous color
-            self.previous_cell_colors[i] = current_color
+        # Colors in display order; once full, the oldest cell sits at the write cursor
+        filled_cells = total_cells if self._filled else self._write_cursor
+        colors = self._grid_cells
+        if self._filled:
+            colors = np.roll(colors, -self._write_cursor, axis=0)
+        
+        # Fill every cell and gap at once: map colors to pixel values, then expand rows and
+        # columns through the pixel maps straight into the screen (in its (y, x) memory order)
+        mapped = pygame.surfarray.map_array(self.screen, colors.reshape(self.grid_rows, self.grid_cols, 3))
+        self._padded_grid[:-1, :-1] = mapped
+        pixels = pygame.surfarray.pixels2d(self.screen)
+        pixels.T[...] = self._padded_grid.take(self._pixel_rows, axis=0).take(self._pixel_cols, axis=1)
+        del pixels  # Unlock the screen surface
+        
+        # Draw text labels on filled cells
+        if self._label_tier:
+            for i, rgb in enumerate(colors[:filled_cells].tolist()):
+                self._draw_label(i, tuple(rgb))
+        
+        # Empty cells: the rest of the current row, then every row below it
+        if filled_cells < total_cells:
+            first_empty = self._cell_rects[filled_cells]
+            row_rest = pygame.Rect(first_empty.left, first_empty.top,
+                                   self.screen_width - first_empty.left, first_empty.height)
+            self.screen.blit(self._empty_bg_surface, row_rest, row_rest)
+            next_row = (filled_cells // self.grid_cols + 1) * self.grid_cols
+            if next_row < total_cells:
+                top = self._cell_rects[next_row].top
+                rows_below = pygame.Rect(0, top, self.screen_width, self.screen_height - top)
+                self.screen.blit(self._empty_bg_surface, rows_below, rows_below)
         
         pygame.display.flip()
     
     def run(self):
         """Main game loop"""
         running = True
+        sleep_ms = 0
         
         while running:
+            # Sleep until an event arrives or the next update is due
+            events = pygame.event.get()
+            if not events and sleep_ms:
+                event = pygame.event.wait(sleep_ms)
+                if event.type != pygame.NOEVENT:
+                    events = [event]
+            
             current_time = pygame.time.get_ticks()
             
             # Handle events
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
@@ -313,12 +461,26 @@ class RGBGridScreensaver:
                 self.update_grid()
                 self.last_update = current_time
             
-            # Draw grid
-            self.draw_grid()
+            # Periodic full repaint even if nothing changed
+            if current_time - self._last_repaint >= self.repaint_interval:
+                self._mark_dirty()
             
-            # Control frame rate
-            self.clock.tick(60)
-        
+            # Draw grid only when it changed
+            if self.needs_redraw:
+                if self._changed_cell is not None:
+                    self.draw_cell(self._changed_cell)
+                else:
+                    self.draw_grid()
+                self.needs_redraw = False
+            
+            # Time until the next grid update or repaint
+            now = pygame.time.get_ticks()
+            sleep_ms = max(1, min(self.update_interval - (now - self.last_update),
+                                  self.repaint_interval - (now - self._last_repaint)))
+        
+        # Stop the audio thread before shutting down the mixer
+        self._note_queue.put(None)
+        self._audio_thread.join()
         pygame.quit()
 
 